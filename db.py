@@ -0,0 +1,44 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+# One SQLAlchemy engine per process and database URL, shared by the loaders
+# and pipeline.py, so every caller draws from the same tuned connection pool.
+
+load_dotenv()
+
+# connections kept open per engine, and how many more may be opened under load
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "16"))
+# seconds before a pooled connection is replaced; Azure drops idle connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# (process id, url, engine options) -> engine
+_engines = {}
+
+
+def _freeze(value):
+    """Turns engine options (nested dicts included) into a hashable cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def get_engine(url, **kwargs):
+    """Returns the engine for this URL and options, creating it on first use in this process."""
+    # engines must not cross a fork, so a child process builds its own; callers
+    # with other options (e.g. local_infile, fast_executemany) get their own engine
+    key = (os.getpid(), url, _freeze(kwargs))
+    if key not in _engines:
+        # pooled connections are reused across chunks and calls, so the
+        # connect/TLS handshake happens once per connection; pre-ping drops
+        # connections the server closed instead of failing the statement
+        _engines[key] = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+            **kwargs
+        )
+    return _engines[key]
@@ -0,0 +1,627 @@
+import os
+import sys
+from pathlib import Path
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pac
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, String, Double
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import re
+import csv
+import io
+import tempfile
+import urllib
+import logging
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from db import get_engine
+
+# Loads the musemotion CSV into MySQL, PostgreSQL or Azure SQL Server.
+# The read + clean path is shared; DB_BACKEND picks the Backend that owns the
+# connection URL, the table options, the native bulk loader and the upsert.
+# load_local_to_db.py, load_musemotion_to_azure.py and load_musemotion_to_db.py
+# are entry points that call run() with their backend, table and write mode.
+
+# logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# our database credentials
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "")
+DB_NAME_RAW = os.getenv("DB_NAME", "musemotion_db")
+DATA_PATH = os.getenv("DATA_PATH", "musemotion_databse.csv")
+# target table; each backend has its own default (see Backend.table)
+TABLE_NAME = os.getenv("TABLE_NAME")
+# "replace" drops and recreates the table, "append" only creates it if missing,
+# "upsert" also creates it if missing and then inserts or updates rows by VIN
+IF_EXISTS = os.getenv("IF_EXISTS")
+# "pandas" cleans the file in DataFrame chunks first; "direct" streams the raw CSV
+# into the database and lets the server do the type casts and lat/long split
+LOAD_MODE = os.getenv("LOAD_MODE", "pandas").lower()
+# number of chunks uploading at the same time while the next one is parsed
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
+# MiB of CSV parsed per chunk
+READ_CHUNK_MB = int(os.getenv("READ_CHUNK_MB", "16"))
+# rows per bulk-load batch; each backend has its own default (see Backend.chunk_rows)
+DB_CHUNK = os.getenv("DB_CHUNK")
+# rows per upsert executemany call
+UPSERT_CHUNK = int(os.getenv("UPSERT_CHUNK", "10000"))
+# above 1, the file is split into this many byte ranges, each parsed, cleaned
+# and uploaded by its own process (os.cpu_count() saturates a single node)
+LOAD_PROCESSES = int(os.getenv("LOAD_PROCESSES", "1"))
+
+# our column names
+column_names = [
+    "vin",
+    "city",
+    "year",
+    "make",
+    "model",
+    "vehicle_type",
+    "eligibility",
+    "electric_range",
+    "vehicle_id",
+    "location",
+    "utility"
+]
+
+# integer columns; years and ranges fit in 16 bits. They are read as text and
+# coerced in clean(), so a malformed value becomes NULL instead of failing the load
+int_types = {
+    "year": pa.int16(),
+    "electric_range": pa.int16(),
+    "vehicle_id": pa.int64()
+}
+
+# parse-time types for the CSV reader: every column is text. The streaming reader
+# would otherwise fix each column's type from the first block, so a later "LEAF"
+# after an all-numeric model block, or a block with no location at all (null
+# type), would break the load
+column_types = {c: pa.string() for c in column_names}
+
+# missing-value spellings: PyArrow's defaults (NULL, N/A, NaN, ...) plus Python's None
+NULL_VALUES = pac.ConvertOptions().null_values + ["None"]
+
+# heavily repeated text columns, stored as category (int codes + one copy of each string)
+category_cols = ["city", "make", "vehicle_type", "eligibility", "utility"]
+
+# to extract lat/long from 'location' column, POINT (lon lat)
+# one coordinate, as the groups of point_re spell it
+NUMBER_RE = r"^[-+]?\d*\.?\d+$"
+point_re = re.compile(r"POINT\s*\(\s*(?P<lon>[-+]?\d*\.?\d+)\s+(?P<lat>[-+]?\d*\.?\d+)\s*\)")
+
+
+def musemotion_table(name, keyed=True):
+    """Returns the SQLAlchemy Table for our schema; keyed adds an id key and a unique VIN."""
+    # built once per run (see run): the table is created from this definition and
+    # the upsert statement compiled against it before the first chunk, and no
+    # chunk ever rebuilds or reflects it
+    key_cols = [Column("id", Integer, primary_key=True, autoincrement=True)] if keyed else []
+    return Table(
+        name,
+        MetaData(),
+        *key_cols,
+        Column("vin", String(50), unique=keyed),
+        Column("city", String(100)),
+        Column("year", Integer),
+        Column("make", String(50)),
+        Column("model", String(100)),
+        Column("vehicle_type", String(255)),
+        Column("eligibility", String(255)),
+        Column("electric_range", Integer),
+        Column("vehicle_id", BigInteger),
+        Column("location", String(255)),
+        Column("utility", String(255)),
+        Column("latitude", Double),
+        Column("longitude", Double)
+    )
+
+
+# Arrow's CSV writer, used to feed LOAD DATA / COPY; nulls are written as empty fields
+CSV_WRITE_OPTIONS = pac.WriteOptions(include_header=False)
+
+
+# backends
+class Backend(ABC):
+    """One database flavour: connection URL, table options and native bulk loader."""
+
+    name = None
+    table = "musemotion"
+    if_exists = "append"
+    chunk_rows = 10000
+    engine_kwargs = {}
+    # whether the table gets an id primary key and a unique VIN
+    keyed = True
+    # optional write paths: LOAD_MODE=direct (load_file) and IF_EXISTS=upsert (upsert_statement)
+    supports_direct = False
+    supports_upsert = False
+
+    @abstractmethod
+    def url(self):
+        """Returns the SQLAlchemy URL for our credentials."""
+
+    @abstractmethod
+    def load_batch(self, cur, table, batch):
+        """Sends one pyarrow.Table slice with the backend's native loader."""
+
+    def bulk_load(self, engine, df, table, truncate=False):
+        """Loads every row of the DataFrame into the table, chunk_rows at a time, and commits."""
+        # one conversion back to Arrow: the Arrow-backed columns are reused as is,
+        # categories become dictionary arrays and NaN becomes null
+        data = pa.Table.from_pandas(df, preserve_index=False)
+        step = int(DB_CHUNK or self.chunk_rows)
+        raw = engine.raw_connection()
+        try:
+            # no context manager here: pyodbc commits on cursor __exit__
+            cur = raw.cursor()
+            try:
+                # truncate empties the table in the same transaction as the load,
+                # so a failed load rolls back to the old rows (not for MySQL,
+                # where TRUNCATE commits implicitly)
+                if truncate:
+                    cur.execute(f"TRUNCATE TABLE {table}")
+                for start in range(0, data.num_rows, step):
+                    # slices are zero-copy views of the same buffers
+                    self.load_batch(cur, table, data.slice(start, step))
+            finally:
+                cur.close()
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    def upsert_statement(self, tbl, columns):
+        """Returns the INSERT that updates the given columns when the VIN already exists."""
+        raise NotImplementedError(f"IF_EXISTS=upsert is not supported for '{self.name}'.")
+
+    def upsert(self, engine, df, stmt):
+        """Inserts the rows with the upsert statement, updating the ones whose VIN already exists, and commits."""
+        # a VIN repeated in the chunk would hit the same row twice in one batch,
+        # which PostgreSQL rejects; the last occurrence wins, as it does in MySQL.
+        # Rows without a VIN match no key and are all inserted
+        df = df[df["vin"].isna() | ~df.duplicated(subset="vin", keep="last")]
+        # Arrow's to_pylist gives None for missing values (to_dict would pass NaN / pd.NA)
+        rows = pa.Table.from_pandas(df, preserve_index=False).to_pylist()
+        # one statement executed over UPSERT_CHUNK-row batches, which the
+        # dialect sends as multi-VALUES pages (see engine_kwargs)
+        with engine.begin() as conn:
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                conn.execute(stmt, rows[start:start + UPSERT_CHUNK])
+
+    def write(self, engine, df, table, upsert_stmt=None):
+        """Writes one cleaned chunk with the bulk loader, or with the upsert statement when one is given."""
+        if upsert_stmt is not None:
+            self.upsert(engine, df, upsert_stmt)
+        else:
+            self.bulk_load(engine, df, table)
+
+    def load_file(self, engine, path, table):
+        """Streams the raw CSV into the table server-side; returns the row count."""
+        raise NotImplementedError(f"LOAD_MODE=direct is not supported for '{self.name}', use LOAD_MODE=pandas.")
+
+    def get_engine(self):
+        """Returns this process's shared SQLAlchemy engine for the backend."""
+        # one engine per process and URL; its pool (see db.py) serves every upload thread
+        return get_engine(self.url(), **self.engine_kwargs)
+
+    def create_table(self, engine, table, replace=False):
+        """Creates the table if missing, dropping it first when replace is set; returns the Table."""
+        # the dialect renders the DDL (AUTO_INCREMENT / SERIAL / IDENTITY, DOUBLE / DOUBLE PRECISION)
+        tbl = musemotion_table(table, keyed=self.keyed)
+        if replace:
+            tbl.drop(engine, checkfirst=True)
+        tbl.create(engine, checkfirst=True)
+        return tbl
+
+
+class MySQLBackend(Backend):
+    name = "mysql"
+    supports_direct = True
+    supports_upsert = True
+    # rows per LOAD DATA file; LOCAL INFILE streams the file, so max_allowed_packet does not cap it
+    chunk_rows = 100000
+    # LOAD DATA LOCAL INFILE has to be allowed by the client as well; statements run
+    # through SQLAlchemy executemany go out as 50k-row multi-VALUES INSERTs (default 1000)
+    engine_kwargs = {"connect_args": {"local_infile": True}, "insertmanyvalues_page_size": 50000}
+
+    def url(self):
+        return f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{int(DB_PORT or 3306)}/{DB_NAME_RAW}"
+
+    def load_batch(self, cur, table, batch):
+        """Writes the batch to a temp CSV and loads it with LOAD DATA LOCAL INFILE."""
+        # Arrow's C++ writer goes from the column buffers straight to the file,
+        # no Python row objects; its empty null fields are mapped back by NULLIF
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp:
+            pac.write_csv(batch, tmp, CSV_WRITE_OPTIONS)
+
+        columns = batch.column_names
+        assignments = [f"`{c}` = NULLIF(@{c}, '')" for c in columns]
+        try:
+            # Arrow doubles embedded quotes and never escapes with backslashes
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                "CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' "
+                f"({', '.join('@' + c for c in columns)}) "
+                f"SET {', '.join(assignments)}",
+                (tmp.name,),
+            )
+        finally:
+            os.remove(tmp.name)
+
+    def upsert_statement(self, tbl, columns):
+        stmt = mysql_insert(tbl)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in columns})
+
+    def load_file(self, engine, path, table):
+        # MySQL ignores the trailing extra fields; empty fields become NULL
+        inner = "TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(@location, '(', -1), ')', 1))"
+        assignments = [f"{c} = NULLIF(@{c}, '')" for c in column_names] + [
+            f"longitude = IF(LOCATE('POINT', @location) = 1, CAST(SUBSTRING_INDEX({inner}, ' ', 1) AS DOUBLE), NULL)",
+            f"latitude = IF(LOCATE('POINT', @location) = 1, CAST(SUBSTRING_INDEX({inner}, ' ', -1) AS DOUBLE), NULL)"
+        ]
+        load_sql = (
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\n' "
+            f"({', '.join('@' + c for c in column_names)}) "
+            f"SET {', '.join(assignments)}"
+        )
+        with engine.begin() as conn:
+            result = conn.exec_driver_sql(load_sql, (str(path),))
+        return result.rowcount
+
+
+class PostgresBackend(Backend):
+    name = "postgres"
+    supports_direct = True
+    supports_upsert = True
+    # rows per COPY; PostgreSQL gains little from larger batches
+    chunk_rows = 10000
+    # SQLAlchemy executemany: INSERTs as multi-VALUES pages, other statements
+    # through psycopg2's execute_batch, instead of one round-trip per row
+    engine_kwargs = {"executemany_mode": "values_plus_batch", "insertmanyvalues_page_size": 10000}
+
+    def url(self):
+        return f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{int(DB_PORT or 5432)}/{DB_NAME_RAW}"
+
+    def load_batch(self, cur, table, batch):
+        """Streams the batch into PostgreSQL with COPY ... FROM STDIN."""
+        # written by Arrow's C++ CSV writer; COPY reads its unquoted empty fields as NULL
+        buf = io.BytesIO()
+        pac.write_csv(batch, buf, CSV_WRITE_OPTIONS)
+        buf.seek(0)
+        quoted = ", ".join(f'"{c}"' for c in batch.column_names)
+        cur.copy_expert(f"COPY {table} ({quoted}) FROM STDIN WITH (FORMAT CSV)", buf)
+
+    def upsert_statement(self, tbl, columns):
+        stmt = pg_insert(tbl)
+        return stmt.on_conflict_do_update(index_elements=["vin"], set_={c: stmt.excluded[c] for c in columns})
+
+    def load_file(self, engine, path, table):
+        # COPY needs every field of the file, so the rows land in a text staging
+        # table first and are cast + inserted in one server-side statement
+        with open(path, newline="", encoding="utf-8") as f:
+            n_fields = len(next(csv.reader(f)))
+        stage_cols = [f"c{i}" for i in range(n_fields)]
+        casts = {"year": "::int", "electric_range": "::int", "vehicle_id": "::bigint"}
+        select_cols = [f"c{i}{casts.get(c, '')}" for i, c in enumerate(column_names)]
+        point = f"regexp_match(c{column_names.index('location')}, 'POINT\\s*\\(\\s*([-+]?[0-9]*\\.?[0-9]+)\\s+([-+]?[0-9]*\\.?[0-9]+)\\s*\\)')"
+
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE {table}_stage ({', '.join(c + ' TEXT' for c in stage_cols)}) ON COMMIT DROP")
+                with open(path, encoding="utf-8") as f:
+                    cur.copy_expert(f"COPY {table}_stage FROM STDIN WITH (FORMAT CSV, HEADER FALSE)", f)
+                cur.execute(
+                    f"INSERT INTO {table} ({', '.join(column_names)}, longitude, latitude) "
+                    f"SELECT {', '.join(select_cols)}, ({point})[1]::double precision, ({point})[2]::double precision "
+                    f"FROM {table}_stage"
+                )
+                rows = cur.rowcount
+            raw.commit()
+        finally:
+            raw.close()
+        return rows
+
+
+class MSSQLBackend(Backend):
+    # the table has a location column the old musemotion_data table lacked;
+    # the default replace mode recreates it (see README)
+    name = "mssql"
+    table = "musemotion_data"
+    if_exists = "replace"
+    # rows per fast_executemany parameter array
+    chunk_rows = 50000
+    engine_kwargs = {"fast_executemany": True}
+    keyed = False
+
+    def url(self):
+        # DB_NAME may carry the server prefix, e.g. "server/database"
+        DB_NAME = DB_NAME_RAW.split('/')[-1]
+        quoted_pw = urllib.parse.quote_plus(DB_PASSWORD)
+        DRIVER = 'ODBC Driver 17 for SQL Server'
+        return (
+            f"mssql+pyodbc://{DB_USER}:{quoted_pw}@{DB_HOST}/"
+            f"{DB_NAME}?driver={DRIVER}"
+        )
+
+    def load_batch(self, cur, table, batch):
+        """Sends the batch as one parameter array through a prepared INSERT with fast_executemany."""
+        # straight to the DBAPI cursor: no table reflection or per-call type mapping
+        # pyodbc binds row tuples, so this backend still builds Python values;
+        # to_pylist hands back None for nulls and plain str for dictionary columns
+        columns = batch.column_names
+        rows = list(zip(*(c.to_pylist() for c in batch.columns)))
+        cur.fast_executemany = True
+        cur.executemany(
+            f"INSERT INTO {table} ({', '.join(f'[{c}]' for c in columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+
+
+# dispatch table for DB_BACKEND
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "postgres": PostgresBackend,
+    "postgresql": PostgresBackend,
+    "mssql": MSSQLBackend
+}
+
+
+def get_backend(name=DB_BACKEND):
+    """Returns the Backend for a DB_BACKEND value."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"DB_BACKEND '{name}' is not supported. Use one of: {', '.join(BACKENDS)}.")
+
+
+# reads the CSV
+def open_source_csv(source):
+    """Opens a streaming PyArrow reader that yields the CSV (path or buffer) in record batches."""
+    # the export carries trailing empty fields, so our columns are picked by position
+    raw_names = [f"f{i}" for i in range(len(column_names))]
+    return pac.open_csv(
+        source,
+        read_options=pac.ReadOptions(autogenerate_column_names=True, use_threads=True, block_size=READ_CHUNK_MB << 20),
+        convert_options=pac.ConvertOptions(
+            include_columns=raw_names,
+            column_types={raw_names[column_names.index(c)]: t for c, t in column_types.items()},
+            null_values=NULL_VALUES,
+            strings_can_be_null=True
+        )
+    )
+
+
+# transformation
+def to_arrow_int(series, pa_type):
+    """Casts a column to a signed Arrow integer type, turning values that are not integers in its range into NA."""
+    if series.dtype == object:
+        # mixed Python values: compare their text like any other column
+        series = series.astype(str)
+    arr = pa.array(series, from_pandas=True)
+    if not pa.types.is_integer(arr.type):
+        s = pc.utf8_trim_whitespace(pc.cast(arr, pa.string()))
+        # Arrow's integer parser rejects a leading "+", pandas' to_numeric does not
+        s = pc.replace_substring_regex(s, r"^\+", "")
+        # plain whole numbers are cast exactly; at most 18 digits, so int64 cannot overflow
+        plain = pc.match_substring_regex(s, r"^-?\d{1,18}$")
+        exact = pc.cast(pc.if_else(plain, s, pa.scalar(None, pa.string())), pa.int64())
+        # other numbers ("23.0", as pandas writes ints in a column with gaps, or "1e3")
+        # count when they are whole; anything else is NA
+        number = pc.and_(pc.invert(plain), pc.match_substring_regex(s, r"^-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"))
+        f = pc.cast(pc.if_else(number, s, pa.scalar(None, pa.string())), pa.float64())
+        whole = pc.and_(pc.equal(pc.floor(f), f), pc.less(pc.abs(f), float(1 << 62)))
+        arr = pc.coalesce(exact, pc.cast(pc.if_else(whole, f, pa.scalar(None, pa.float64())), pa.int64()))
+    # values outside the signed target type (e.g. a range of 99999 for int16) are NA too
+    limit = 1 << (pa_type.bit_width - 1)
+    in_range = pc.and_(pc.greater_equal(arr, -limit), pc.less_equal(arr, limit - 1))
+    arr = pc.if_else(in_range, arr, pa.scalar(None, arr.type))
+    return pd.Series(pd.arrays.ArrowExtensionArray(pc.cast(arr, pa_type)), index=series.index, name=series.name)
+
+
+def point_coords(location):
+    """Parses 'POINT (lon lat)' strings into float64 (lon, lat) arrays, NaN where there is no point."""
+    arr = pa.array(location, from_pandas=True)
+    if not pa.types.is_string(arr.type):
+        # e.g. an all-missing column typed null, or a dictionary column
+        arr = pc.cast(arr, pa.string())
+    # fast path for the export's own spelling: slice off "POINT (" and ")" and
+    # split on the single space, no regex engine involved
+    parts = pc.split_pattern(pc.utf8_slice_codeunits(arr, 7, -1), " ")
+    shape = pc.and_(pc.and_(pc.starts_with(arr, "POINT ("), pc.ends_with(arr, ")")), pc.equal(pc.list_value_length(parts), 2))
+    parts = pc.if_else(pc.fill_null(shape, False), parts, pa.scalar(None, parts.type))
+    lon_s, lat_s = pc.list_element(parts, 0), pc.list_element(parts, 1)
+    # each part must be a number as point_re spells it, checked row by row, so
+    # "nan", "inf" or "1e5" fall through to the regex, which rejects them as well
+    fast = pc.fill_null(pc.and_(pc.match_substring_regex(lon_s, NUMBER_RE), pc.match_substring_regex(lat_s, NUMBER_RE)), False)
+    lon = pc.cast(pc.if_else(fast, lon_s, pa.scalar(None, pa.string())), pa.float64())
+    lat = pc.cast(pc.if_else(fast, lat_s, pa.scalar(None, pa.string())), pa.float64())
+
+    # any other spelling (extra spaces, "POINT(", junk) goes through pyarrow's
+    # RE2 kernel, whose groups only match well-formed numbers
+    rest = pc.and_(pc.invert(fast), pc.is_valid(arr))
+    if pc.any(rest).as_py():
+        coords = pc.extract_regex(pc.if_else(rest, arr, pa.scalar(None, arr.type)), point_re.pattern)
+        lon = pc.coalesce(lon, pc.cast(pc.struct_field(coords, "lon"), pa.float64()))
+        lat = pc.coalesce(lat, pc.cast(pc.struct_field(coords, "lat"), pa.float64()))
+    # a digit string too long for a double parses as inf; both paths treat it as no point
+    finite = pc.and_(pc.is_finite(lon), pc.is_finite(lat))
+    lon = pc.if_else(finite, lon, pa.scalar(None, pa.float64()))
+    lat = pc.if_else(finite, lat, pa.scalar(None, pa.float64()))
+    return lon.to_numpy(zero_copy_only=False), lat.to_numpy(zero_copy_only=False)
+
+
+def clean(batch, drop_incomplete=True):
+    """Turns one record batch into the target table's row layout."""
+    df = pa.Table.from_batches([batch]).rename_columns(column_names).to_pandas(types_mapper=pd.ArrowDtype)
+
+    # first, drops rows with missing VIN/City (which are critical fields),
+    # before any other column is touched
+    if drop_incomplete:
+        df.dropna(subset=["vin", "city"], inplace=True)
+
+    #  data cleaning and transformation process
+    for c, t in int_types.items():
+        df[c] = to_arrow_int(df[c], t)
+    for c in category_cols:
+        df[c] = df[c].astype("category")
+
+    # second, extracts lat/long
+    # misses become NaN in plain float64 (no Float64 mask); bulk_load sends them as NULL
+    lon, lat = point_coords(df["location"])
+    df["latitude"] = lat
+    df["longitude"] = lon
+
+    # the columns are already in table order (column_names, then latitude/longitude),
+    # so there is no reindex copy of the frame
+    return df
+
+
+# parallel loading
+def split_byte_ranges(path, n):
+    """Splits the file into n byte ranges that start and end on line boundaries."""
+    # assumes no newlines inside quoted values, same as the PyArrow reader
+    size = os.path.getsize(path)
+    if n <= 1 or size == 0:
+        return [(0, size)]
+    bounds = [0]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, n):
+            cut = mm.find(b"\n", max(bounds[-1], size * i // n))
+            if cut == -1:
+                break
+            bounds.append(cut + 1)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def load_byte_range(backend_name, table, path, start, end, drop_incomplete):
+    """Worker process: parses, cleans and bulk-loads one byte range of the CSV."""
+    # engines must not cross a fork, so every process opens its own
+    backend = get_backend(backend_name)
+    engine = backend.get_engine()
+    rows = 0
+    with pa.memory_map(path) as source:
+        source.seek(start)
+        # zero-copy view of the mapped file, valid while the map is open
+        for batch in open_source_csv(pa.BufferReader(source.read_buffer(end - start))):
+            df = clean(batch, drop_incomplete)
+            backend.write(engine, df, table)
+            rows += len(df)
+    engine.dispose()
+    logger.info(f"Bytes {start}-{end}: loaded {rows} rows.")
+    return rows
+
+
+def load_chunks(backend, engine, path, table, upsert_stmt=None, drop_incomplete=True):
+    """Parses, cleans and uploads the CSV chunk by chunk, upserting when a statement is given; returns the row count."""
+    # upserts must land in file order for the last occurrence of a VIN to win,
+    # so they go one chunk at a time on a single process
+    upsert = upsert_stmt is not None
+    if LOAD_PROCESSES > 1 and not upsert:
+        # one process per byte range; close our pooled connections before forking
+        engine.dispose()
+        ranges = split_byte_ranges(path, LOAD_PROCESSES)
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(load_byte_range, backend.name, table, str(path), start, end, drop_incomplete) for start, end in ranges]
+            return sum(f.result() for f in futures)
+
+    # parse + clean chunk N+1 while chunk N is still uploading;
+    # at most LOAD_WORKERS uploads are in flight before we wait on the oldest
+    workers = 1 if upsert else LOAD_WORKERS
+    total_rows = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, batch in enumerate(open_source_csv(path)):
+            df = clean(batch, drop_incomplete)
+            logger.info(f"Chunk {i}: {batch.num_rows} rows read, {len(df)} rows after cleaning.")
+
+            # data is loaded with the backend's bulk loader (LOAD DATA / COPY / fast_executemany)
+            # or its upsert
+            pending.append(executor.submit(backend.write, engine, df, table, upsert_stmt))
+            total_rows += len(df)
+            if len(pending) >= workers:
+                pending.popleft().result()
+
+        while pending:
+            pending.popleft().result()
+    return total_rows
+
+
+def run(data_path, backend, table=None, if_exists=None, drop_incomplete=True):
+    """Creates the table if needed and loads the CSV into it; returns the row count."""
+    table = table or TABLE_NAME or backend.table
+    if_exists = if_exists or IF_EXISTS or backend.if_exists
+
+    # settings are checked before anything touches the database; replace mode
+    # would otherwise drop the table and only then find the load unsupported
+    if if_exists not in ("replace", "append", "upsert"):
+        raise ValueError(f"IF_EXISTS '{if_exists}' is not supported. Use one of: replace, append, upsert.")
+    if LOAD_MODE not in ("pandas", "direct"):
+        raise ValueError(f"LOAD_MODE '{LOAD_MODE}' is not supported. Use one of: pandas, direct.")
+    if if_exists == "upsert" and not backend.supports_upsert:
+        raise ValueError(f"IF_EXISTS=upsert is not supported for '{backend.name}'.")
+    # the server-side file load only inserts, so upserts always go through the chunks
+    direct = LOAD_MODE == "direct" and if_exists != "upsert"
+    if direct and not backend.supports_direct:
+        raise ValueError(f"LOAD_MODE=direct is not supported for '{backend.name}', use LOAD_MODE=pandas.")
+
+    # failures are raised, not exited on: the entry-point scripts decide how to stop
+    try:
+        engine = backend.get_engine()
+    except Exception as e:
+        raise RuntimeError(f"Could not connect to database. Error: {e}") from e
+    logger.info(f"Using {backend.name} engine.")
+
+    data_path = Path(data_path)
+    if not data_path.exists():
+        raise FileNotFoundError(f"Data file not found: {data_path}")
+
+    replace = if_exists == "replace"
+    tbl = backend.create_table(engine, table, replace=replace)
+    logger.info(f"{'Recreated' if replace else 'Ensured'} table '{table}'.")
+
+    # the server-side file load inserts every row as is (drop_incomplete does not apply)
+    if direct:
+        total_rows = backend.load_file(engine, data_path, table)
+    else:
+        # one statement for the whole run, updating every column but the keys
+        upsert_stmt = None
+        if if_exists == "upsert":
+            upsert_stmt = backend.upsert_statement(tbl, [c.name for c in tbl.columns if c.name not in ("id", "vin")])
+        total_rows = load_chunks(backend, engine, data_path, table, upsert_stmt, drop_incomplete)
+
+    logger.info(f"Successfully loaded {total_rows} rows to '{table}'.")
+    return total_rows
+
+
+def main(backend, **kwargs):
+    """Entry-point wrapper around run(): logs a failed load and exits with status 1."""
+    try:
+        run(DATA_PATH, backend, **kwargs)
+    except Exception as e:
+        logger.error(f"FATAL: {e}")
+        sys.exit(1)
+
+
+# the main execution
+if __name__ == "__main__":
+    main(get_backend())
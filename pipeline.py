@@ -1,11 +1,19 @@
 import os
-import re
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pac
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
 from azure.storage.blob import BlobServiceClient
+from azure.core.pipeline.transport import RequestsTransport
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import urllib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from loader import MSSQLBackend, NULL_VALUES, point_coords, to_arrow_int
+from db import get_engine
 
 # --- Setup Logging ---
 # Sets up basic logging to show INFO level messages in the console
@@ -20,6 +28,12 @@ load_dotenv()
 AZURE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
 AZURE_ACCOUNT_KEY = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME")
+# Number of blobs downloaded at the same time (downloads are network-bound)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "16"))
+
+# Parquet copy of the cleaned data; the Streamlit dashboard (streamlit_app.py) reads
+# the same PARQUET_PATH and prefers it over the Excel workbook
+PARQUET_PATH = os.getenv("PARQUET_PATH", "musemotion_data.parquet")
 
 # Azure SQL Server (Destination)
 DB_BACKEND = os.getenv("DB_BACKEND")
@@ -34,12 +48,26 @@ COLUMN_NAMES = [
     "Eligibility", "Electric_Range", "Vehicle_ID", "Location", "Utility"
 ]
 
-# Regex for extracting latitude and longitude from the 'Location' point string
-POINT_RE = re.compile(r"POINT\s*\(\s*([-\d\.]+)\s+([-\d\.]+)\s*\)")
+# Parse-time types: every column comes out of the reader as Arrow strings, so all
+# blobs concat to the same types; the numeric ones are coerced in clean_dataframe
+TEXT_TYPES = {c: pa.string() for c in COLUMN_NAMES}
+
+# Heavily repeated text columns, kept as pandas categoricals after cleaning
+CATEGORY_COLS = ["City", "Make", "Vehicle_Type", "Eligibility", "Utility"]
+
+def require_env(**settings):
+    """Raises if any of the given settings was not provided in the environment."""
+    missing = [name for name, value in settings.items() if not value]
+    if missing:
+        raise ValueError(f"Missing environment variable(s): {', '.join(missing)}")
 
 # --- Database Engine Setup ---
+# Connections are opened on first use rather than at import time, so importing
+# this module (e.g. for clean_dataframe) needs neither credentials nor network
+@lru_cache(maxsize=None)
 def get_db_engine():
     """Configures and returns the SQLAlchemy engine for Azure SQL Server."""
+    require_env(DB_HOST=DB_HOST, DB_NAME=DB_NAME_RAW, DB_USER=DB_USER, DB_PASSWORD=DB_PASSWORD)
     
     # We strip the database name in case it includes the server prefix from the .env
     DB_NAME = DB_NAME_RAW.split('/')[-1]
@@ -57,33 +85,57 @@ def get_db_engine():
             f"{DB_NAME}?driver={DRIVER}"
         )
         
-        # 'fast_executemany=True' helps pandas bulk-insert data to MS SQL Server
-        return create_engine(engine_url, fast_executemany=True)
+        # 'fast_executemany=True' helps pandas bulk-insert data to MS SQL Server;
+        # the engine and its connection pool are shared per process (see db.py)
+        return get_engine(engine_url, fast_executemany=True)
     
     else:
         raise ValueError(f"Unsupported DB_BACKEND: {DB_BACKEND}. Must be 'mssql'.")
 
+# --- Azure Blob Setup ---
+@lru_cache(maxsize=None)
+def get_container_client():
+    """Configures and returns the client for the source Azure Blob container."""
+    require_env(
+        AZURE_STORAGE_ACCOUNT_NAME=AZURE_ACCOUNT_NAME,
+        AZURE_STORAGE_ACCOUNT_KEY=AZURE_ACCOUNT_KEY,
+        AZURE_CONTAINER_NAME=AZURE_CONTAINER_NAME,
+    )
+    connection_str = (
+        f"DefaultEndpointsProtocol=https;"
+        f"AccountName={AZURE_ACCOUNT_NAME};"
+        f"AccountKey={AZURE_ACCOUNT_KEY};"
+        f"EndpointSuffix=core.windows.net"
+    )
+    # The default HTTP pool keeps only 10 connections to the account, which would
+    # make most of the DOWNLOAD_WORKERS threads queue for a socket; the Azure
+    # pipeline does its own retrying, so urllib3's retries stay off
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_maxsize=DOWNLOAD_WORKERS,
+        max_retries=Retry(total=False, redirect=False, raise_on_status=False)
+    ))
+    blob_service_client = BlobServiceClient.from_connection_string(
+        connection_str, transport=RequestsTransport(session=session)
+    )
+    return blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+
 # --- Transformation Function (T) ---
-def extract_lat_lon(point_str):
-    """Extracts latitude and longitude from the POINT (lon lat) string."""
-    try:
-        if pd.isna(point_str) or not isinstance(point_str, str):
-            return pd.NA, pd.NA
-        match = POINT_RE.search(point_str)
-        if match:
-            # NOTE: POINT (lon lat) -> we return (lat, lon)
-            lon, lat = match.groups()
-            return float(lat), float(lon)
-    except Exception as e:
-        logger.warning(f"Error parsing location string '{point_str}': {e}")
-    return pd.NA, pd.NA
+def clean_text(series: pd.Series) -> pd.Series:
+    """Strips whitespace and turns blank strings and missing-value tokens into NA."""
+    # The reader only matches exact tokens, so padded ones such as " nan " are masked here
+    if series.dtype != pd.ArrowDtype(pa.string()):
+        # only columns the reader did not type as text need converting
+        series = series.astype(pd.ArrowDtype(pa.string()))
+    s = series.str.strip()
+    return s.mask(s.isin(NULL_VALUES))
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Applies all cleaning and transformation rules to the DataFrame."""
     logger.info(f"Initial dataframe shape: {df.shape}")
     
     # 1. Assign/Correct Column Names
-    # Assuming the merged CSVs have no header row (header=None in pd.read_csv)
+    # Assuming the merged CSVs have no header row (autogenerated column names in pac.read_csv)
     if len(df.columns) == len(COLUMN_NAMES):
         df.columns = COLUMN_NAMES
     else:
@@ -95,53 +147,91 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         else:
              raise ValueError("Column count mismatch in merged data. Cannot proceed with cleaning.")
 
-    # 2. Clean Text Fields (Strip whitespace, convert 'nan' strings to NA)
-    text_cols = ["VIN", "City", "Make", "Model", "Vehicle_Type", "Eligibility", "Utility"]
+    # 2. Drop rows missing critical data (VIN and City) before any other column work,
+    # so dropped rows are never stripped, cast or regex-scanned
+    for c in ["VIN", "City"]:
+        df[c] = clean_text(df[c])
+    before = len(df)
+    df = df.loc[df["VIN"].notna() & df["City"].notna()]
+    logger.info(f"Dropped {before - len(df)} rows missing VIN/City.")
+
+    # 3. Clean remaining Text Fields
+    text_cols = ["Make", "Model", "Vehicle_Type", "Eligibility", "Utility"]
     for c in text_cols:
         if c in df.columns:
-            df[c] = df[c].astype(str).str.strip().replace({'nan': pd.NA, 'None': pd.NA, '': pd.NA})
+            df[c] = clean_text(df[c])
 
-    # 3. Drop rows missing critical data (VIN and City)
-    df.dropna(subset=["VIN", "City"], inplace=True)
+    # Low-cardinality text is stored as category: small int codes + one copy of each string
+    for c in CATEGORY_COLS:
+        df[c] = df[c].astype("category")
     
-    # 4. Convert Numeric Fields Safely (Int64 preserves NA)
-    df["Year"] = pd.to_numeric(df["Year"], errors="coerce").astype("Int64")
-    df["Electric_Range"] = pd.to_numeric(df["Electric_Range"], errors="coerce").astype("Int64")
-    df["Vehicle_ID"] = pd.to_numeric(df["Vehicle_ID"], errors="coerce").astype("Int64")
+    # 4. Convert Numeric Fields Safely (Arrow integers preserve NA)
+    # to_arrow_int (shared with loader.py) accepts whole numbers, "2020.0" included;
+    # anything else becomes NA
+    # Years and ranges (miles) fit in 16 bits; Vehicle_ID stays 64-bit as it is an identifier
+    df["Year"] = to_arrow_int(df["Year"], pa.int16())
+    df["Electric_Range"] = to_arrow_int(df["Electric_Range"], pa.int16())
+    df["Vehicle_ID"] = to_arrow_int(df["Vehicle_ID"], pa.int64())
 
     # 5. Extract Latitude & Longitude from Location
-    # 'zip(*...)' unpacks the tuples returned by the mapping
-    latitudes, longitudes = zip(*df["Location"].apply(extract_lat_lon))
-    df["Latitude"] = latitudes
-    df["Longitude"] = longitudes
+    # One vectorized pass over the whole column; NOTE: POINT (lon lat)
+    # point_coords splits the usual "POINT (lon lat)" spelling with Arrow string
+    # kernels and leaves only the odd rows to pyarrow's RE2 regex (see loader.py);
+    # misses become NaN in plain float64 arrays, so there is no Float64 validity
+    # mask to carry through the upload
+    lon, lat = point_coords(df["Location"].astype(pd.ArrowDtype(pa.string())))
+    df["Latitude"] = lat
+    df["Longitude"] = lon
     
-    # 6. Final Column Selection
-    final_cols = COLUMN_NAMES + ["Latitude", "Longitude"]
-    df = df[final_cols]
+    # 6. Final Column Order
+    # Columns are already COLUMN_NAMES followed by Latitude/Longitude (appended above),
+    # so the frame is returned as is instead of through a reindexing copy
 
     logger.info(f"Cleaned dataframe shape: {df.shape}")
     return df
 
 # --- Extraction Function (E) ---
+def fetch_csv(container_client, blob_name):
+    """Downloads one CSV blob and parses it; returns None if it cannot be read."""
+    logger.info(f"Downloading {blob_name}...")
+    blob_client = container_client.get_blob_client(blob_name)
+    data = blob_client.download_blob().readall()
+
+    # The CSV data often lacks headers, so columns get generated names (f0, f1, ...);
+    # our 11 columns are picked and typed by position (extra trailing fields are skipped)
+    # PyArrow parses the blob on all cores, and to_pandas hands its buffers over as
+    # Arrow-backed columns without a copy (self_destruct frees each one as it goes)
+    raw_names = [f"f{i}" for i in range(len(COLUMN_NAMES))]
+    try:
+        table = pac.read_csv(
+            pa.BufferReader(data),
+            read_options=pac.ReadOptions(autogenerate_column_names=True, use_threads=True),
+            convert_options=pac.ConvertOptions(
+                include_columns=raw_names,
+                column_types={raw_names[COLUMN_NAMES.index(c)]: t for c, t in TEXT_TYPES.items()},
+                null_values=NULL_VALUES,
+                strings_can_be_null=True
+            )
+        )
+        return table.rename_columns(COLUMN_NAMES).to_pandas(self_destruct=True, types_mapper=pd.ArrowDtype)
+    except Exception as e:
+        logger.error(f"Failed to read CSV {blob_name}: {e}")
+        return None
+
 def download_and_merge_csvs(container_client):
     """Downloads all CSV blobs from Azure and merges them."""
-    all_dfs = []
     logger.info(f"Starting download from Azure Blob Container: {AZURE_CONTAINER_NAME}")
-    
-    for blob in container_client.list_blobs():
-        if blob.name.endswith(".csv"):
-            logger.info(f"Downloading {blob.name}...")
-            blob_client = container_client.get_blob_client(blob.name)
-            stream = blob_client.download_blob()
-            
-            # Use 'header=None' as the CSV data often lacks headers
-            try:
-                df = pd.read_csv(stream, header=None)
-                all_dfs.append(df)
-            except Exception as e:
-                logger.error(f"Failed to read CSV {blob.name}: {e}")
+    blob_names = [blob.name for blob in container_client.list_blobs() if blob.name.endswith(".csv")]
+
+    # Downloads overlap instead of waiting on each blob's round-trips in turn;
+    # map() keeps the container's blob order in the merged frame
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        results = executor.map(lambda name: fetch_csv(container_client, name), blob_names)
+        all_dfs = [df for df in results if df is not None]
                 
     if all_dfs:
+        # Every column is Arrow-backed, so concat only chains each file's buffers
+        # into one chunked array (no copy, no second full-size frame in memory)
         merged_df = pd.concat(all_dfs, ignore_index=True)
         logger.info(f"Merged {len(all_dfs)} CSV files. Total rows: {len(merged_df)}")
         return merged_df
@@ -149,29 +239,39 @@ def download_and_merge_csvs(container_client):
         logger.warning("No CSV files found or merged from the container.")
         return pd.DataFrame()
 
+# --- Dashboard Export ---
+def save_parquet(df, path=PARQUET_PATH):
+    """Writes the cleaned DataFrame to the Parquet file the dashboard reads."""
+    try:
+        # Arrow-backed columns are written as is; categories become dictionary columns
+        df.to_parquet(path, engine="pyarrow", compression="zstd", row_group_size=100_000, index=False)
+        logger.info(f"Wrote {len(df)} rows to '{path}'.")
+    except Exception as e:
+        logger.error(f"Failed to write the dashboard Parquet file '{path}': {e}")
+
 # --- Load Function (L) ---
 def upload_df_to_db(df, engine, table_name="musemotion_data"):
-    """Uploads the DataFrame to the Azure SQL Server database using 'replace'."""
+    """Replaces the contents of the Azure SQL Server table with the DataFrame."""
     if df.empty:
         logger.warning("No data to upload. Skipping database load.")
         return
         
     logger.info(f"Uploading {len(df)} rows to Azure SQL Server table '{table_name}'.")
     
-    # Use 'replace' to drop and recreate the table, ensuring a clean and consistent schema.
+    # The table is kept and emptied instead of dropped and recreated on every run:
+    # TRUNCATE deallocates the old pages in one minimally logged step
     try:
-        df.to_sql(
-            table_name, 
-            con=engine, 
-            if_exists='replace', # Crucial: drops the old table and creates a new one
-            index=False, 
-            method='multi',
-            chunksize=500
-        )
+        with engine.begin() as conn:
+            # Creates the table from our dtypes only on the first run
+            df.head(0).to_sql(table_name, con=conn, if_exists='append', index=False)
+        # Rows go through the shared SQL Server bulk loader (fast_executemany, DB_CHUNK rows per batch);
+        # the TRUNCATE runs in the same transaction, so a failed upload keeps the old rows
+        MSSQLBackend().bulk_load(engine, df, table_name, truncate=True)
         logger.info(f"Successfully uploaded {len(df)} rows to '{table_name}'.")
     except Exception as e:
         logger.error(f"FATAL: Failed to upload data to DB. Ensure the ODBC driver is installed and the firewall is open to your IP. Error: {e}")
         # The Streamlit app (`app.py`) also uses this table name, so success here is critical.
+        raise
 
 # --- Main Pipeline Execution ---
 if __name__ == "__main__":
@@ -179,15 +279,7 @@ if __name__ == "__main__":
     # 1. Setup Connections
     try:
         engine = get_db_engine()
-        
-        connection_str = (
-            f"DefaultEndpointsProtocol=https;"
-            f"AccountName={AZURE_ACCOUNT_NAME};"
-            f"AccountKey={AZURE_ACCOUNT_KEY};"
-            f"EndpointSuffix=core.windows.net"
-        )
-        blob_service_client = BlobServiceClient.from_connection_string(connection_str)
-        container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
+        container_client = get_container_client()
         logger.info("Database and Azure Blob connections established.")
     except Exception as e:
         logger.critical(f"FATAL: Failed to establish required connections. Check your .env credentials, DB_BACKEND setting, or ODBC drivers. Error: {e}")
@@ -203,7 +295,10 @@ if __name__ == "__main__":
     # 3. Transformation
     cleaned_df = clean_dataframe(raw_df)
     
-    # 4. Loading
+    # 4. Dashboard data file
+    save_parquet(cleaned_df)
+    
+    # 5. Loading
     upload_df_to_db(cleaned_df, engine, table_name="musemotion_data")
     
     logger.info("Pipeline completed successfully!")
\ No newline at end of file
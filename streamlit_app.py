@@ -1,12 +1,21 @@
 # streamlit_app.py
 import difflib
+import logging
+import os
 from pathlib import Path
+from dotenv import load_dotenv
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
 st.set_page_config(page_title="Muse Motion", page_icon=":bar_chart:", layout="wide")
 
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# cleaned data exported by pipeline.py; used instead of the Excel file when present
+PARQUET_PATH = os.getenv("PARQUET_PATH", "musemotion_data.parquet")
+
 EXPECTED_COLS = [
     "vin",
     "city",
@@ -21,12 +30,32 @@ EXPECTED_COLS = [
     "utility",
 ]
 
+# Repeated text columns, stored as categoricals so filters and group-bys work on codes
+CATEGORY_COLS = ["city", "make", "model", "vehicle_type", "eligibility", "utility"]
+
 def normalize_cols(cols):
     """Force to string, strip, lowercase, replace spaces with underscores."""
     cols = list(map(str, cols))
     cols = [c.strip().lower().replace(" ", "_") for c in cols]
     return cols
 
+# One matcher per expected name, built once: SequenceMatcher indexes its second
+# sequence, so only the candidate column changes between comparisons
+EXPECTED_MATCHERS = {e: difflib.SequenceMatcher(b=e) for e in EXPECTED_COLS}
+
+def has_close_match(matcher, cols, cutoff):
+    """True if any column is as similar as difflib.get_close_matches(..., cutoff) requires."""
+    for c in cols:
+        matcher.set_seq1(c)
+        # cheap upper bounds first, the full ratio only for likely matches
+        if (
+            matcher.real_quick_ratio() >= cutoff
+            and matcher.quick_ratio() >= cutoff
+            and matcher.ratio() >= cutoff
+        ):
+            return True
+    return False
+
 def score_header_candidate(cols, expected=EXPECTED_COLS):
     """Score candidate header row based on matches to expected columns."""
     cols_norm = normalize_cols(cols)
@@ -36,11 +65,11 @@ def score_header_candidate(cols, expected=EXPECTED_COLS):
         if e in existing:
             score += 2
         else:
-            if difflib.get_close_matches(e, cols_norm, n=1, cutoff=0.7):
+            matcher = EXPECTED_MATCHERS.get(e) or difflib.SequenceMatcher(b=e)
+            if has_close_match(matcher, cols_norm, cutoff=0.7):
                 score += 1
     return score
 
-@st.cache_data
 def get_data_from_excel_auto_header(path: str = "musemotion_data.xlsx", sheet_name="Sheet1"):
     """Read Excel and auto-detect header row."""
     if not Path(path).exists():
@@ -49,12 +78,15 @@ def get_data_from_excel_auto_header(path: str = "musemotion_data.xlsx", sheet_na
     best_score = -1
     best_header = None
 
-    for header_row in range(0, 11):
-        try:
-            sample = pd.read_excel(io=path, engine="openpyxl", sheet_name=sheet_name, header=header_row, nrows=0)
-        except Exception:
-            continue
-        cols = list(sample.columns)
+    # Parse the first 11 rows once and score each as a header candidate in memory,
+    # instead of reopening the workbook for every candidate row
+    try:
+        preview = pd.read_excel(io=path, engine="openpyxl", sheet_name=sheet_name, header=None, nrows=11)
+    except Exception:
+        preview = pd.DataFrame()
+
+    for header_row in range(len(preview)):
+        cols = preview.iloc[header_row].tolist()
         score = score_header_candidate(cols)
         if score > best_score:
             best_score = score
@@ -76,9 +108,58 @@ def get_data_from_excel_auto_header(path: str = "musemotion_data.xlsx", sheet_na
     except Exception as e:
         raise RuntimeError(f"Could not detect header row automatically. Also failed fallback read: {e}")
 
+def to_text(df):
+    """Turn mixed-value object columns (e.g. model 500 next to "LEAF") into strings."""
+    for c in df.columns:
+        if pd.api.types.is_object_dtype(df[c]):
+            # missing cells stay NA instead of becoming "nan"
+            df[c] = df[c].astype("string")
+    return df
+
+def to_categories(df):
+    """Store the repeated text columns as categoricals."""
+    for c in CATEGORY_COLS:
+        if c in df.columns and (pd.api.types.is_object_dtype(df[c]) or pd.api.types.is_string_dtype(df[c])):
+            df[c] = df[c].astype("category")
+    return df
+
+def data_version(path: str = "musemotion_data.xlsx", export_path: str = PARQUET_PATH):
+    """Modification times of the data files, passed to the cached loaders so they refresh when a file changes."""
+    return tuple(Path(p).stat().st_mtime if Path(p).exists() else None for p in (export_path, path))
+
+@st.cache_data
+def get_data(path: str = "musemotion_data.xlsx", sheet_name="Sheet1", export_path: str = PARQUET_PATH, version=None):
+    """Read the pipeline's Parquet export, or else the Excel file through its own Parquet cache."""
+    # version (see data_version) is only part of the cache key
+    if Path(export_path).exists():
+        # typed columns; categoricals round-trip through Parquet as dictionary columns
+        df = pd.read_parquet(export_path, engine="pyarrow")
+        df.columns = normalize_cols(df.columns)
+        return to_categories(df)
+
+    excel_path = Path(path)
+    # a separate file next to the workbook, so it never overwrites the pipeline's export
+    cache_path = excel_path.with_name(excel_path.name + ".parquet")
+    if (
+        excel_path.exists()
+        and cache_path.exists()
+        and cache_path.stat().st_mtime >= excel_path.stat().st_mtime
+    ):
+        return pd.read_parquet(cache_path, engine="pyarrow")
+
+    # Parquet needs one type per column, so mixed text columns become strings first
+    df = to_categories(to_text(get_data_from_excel_auto_header(path, sheet_name)))
+    try:
+        df.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
+    except Exception as e:
+        # the next load reads Excel again
+        logger.warning(f"Could not write the Parquet cache '{cache_path}': {e}")
+    return df
+
 # --- Load data ---
 try:
-    df = get_data_from_excel_auto_header()
+    version = data_version()
+    df = get_data(version=version)
 except Exception as e:
     st.error(str(e))
     st.stop()
@@ -141,18 +222,22 @@ if range_col and range_col in df.columns:
 # --- Sidebar filters ---
 st.sidebar.header("Please Filter Here:")
 
-def sorted_unique_or_empty(col_name):
-    if col_name and col_name in df.columns:
-        vals = df[col_name].dropna().unique().tolist()
+# Computed once per column instead of on every widget change; the leading underscore
+# keeps Streamlit from hashing the frame; version (see data_version) ties the
+# cached options to the data get_data loaded
+@st.cache_data
+def sorted_unique_or_empty(_df, col_name, version=None):
+    if col_name and col_name in _df.columns:
+        vals = _df[col_name].dropna().unique().tolist()
         try:
             return sorted(vals)
         except Exception:
             return list(vals)
     return []
 
-city_options = sorted_unique_or_empty(city_col)
-model_options = sorted_unique_or_empty(model_col)
-make_options = sorted_unique_or_empty(make_col)
+city_options = sorted_unique_or_empty(df, city_col, version)
+model_options = sorted_unique_or_empty(df, model_col, version)
+make_options = sorted_unique_or_empty(df, make_col, version)
 
 if not city_options or not model_options or not make_options:
     st.error("Required filter columns have no valid values. Check dataset or toggle debug options.")
@@ -178,14 +263,17 @@ st.title(":bar_chart: Muse Motion Electric Vehicles")
 st.markdown("##")
 
 total_vehicles = len(df_selection)
+# Both averages in one pass; a column with no values averages to NaN and shows as N/A
+kpi_cols = [c for c in (year_col, range_col) if c and c in df_selection.columns]
+kpi_means = df_selection[kpi_cols].mean()
 average_year = (
-    round(df_selection[year_col].mean(), 1)
-    if (year_col and year_col in df_selection.columns and not df_selection[year_col].dropna().empty)
+    round(kpi_means[year_col], 1)
+    if (year_col in kpi_means.index and pd.notna(kpi_means[year_col]))
     else "N/A"
 )
 average_electric_range = (
-    round(df_selection[range_col].mean(), 2)
-    if (range_col and range_col in df_selection.columns and not df_selection[range_col].dropna().empty)
+    round(kpi_means[range_col], 2)
+    if (range_col in kpi_means.index and pd.notna(kpi_means[range_col]))
     else "N/A"
 )
 
@@ -202,7 +290,7 @@ with right_column:
 
 st.markdown("---")
 
-vehicles_by_make = df_selection.groupby(by=make_col).size().sort_values(ascending=True)
+vehicles_by_make = df_selection.groupby(by=make_col, observed=True).size().sort_values(ascending=True)
 fig_vehicle_make = px.bar(
     x=vehicles_by_make.values,
     y=vehicles_by_make.index,
@@ -212,7 +300,7 @@ fig_vehicle_make = px.bar(
 )
 fig_vehicle_make.update_layout(plot_bgcolor="rgba(0,0,0,0)", xaxis=dict(showgrid=False))
 
-make_by_city = df_selection.groupby(by=city_col).size().sort_values(ascending=False)
+make_by_city = df_selection.groupby(by=city_col, observed=True).size().sort_values(ascending=False)
 fig_make_city = px.bar(
     x=make_by_city.values,
     y=make_by_city.index,